@@ -1,5 +1,6 @@
 """Configuration settings for the arXiv MCP server."""
 
+import os
 import sys
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
@@ -18,6 +19,9 @@ class Settings(BaseSettings):
     REQUEST_TIMEOUT: int = 60
     HOST: str = "0.0.0.0"
     PORT: int = 8000
+    EXTRACT_IMAGES: bool = False
+    CONVERSION_WORKERS: int = os.cpu_count() or 1
+    KEEP_PDF: bool = False
     model_config = SettingsConfigDict(extra="allow")
 
     @property
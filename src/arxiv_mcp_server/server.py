@@ -6,7 +6,6 @@ This module implements an MCP server for interacting with arXiv.
 """
 
 import logging
-import asyncio
 import mcp.types as types
 from typing import Dict, Any, List
 from mcp.server import Server
@@ -14,8 +13,15 @@ from mcp.server.models import InitializationOptions
 from mcp.server import NotificationOptions
 from mcp.server.stdio import stdio_server
 from .config import Settings
-from .tools import handle_search, handle_download, handle_list_papers, handle_read_paper
-from .tools import search_tool, download_tool, list_tool, read_tool
+from .tools import (
+    handle_search,
+    handle_download,
+    handle_download_batch,
+    handle_list_papers,
+    handle_read_paper,
+)
+from .tools import search_tool, download_tool, batch_download_tool, list_tool, read_tool
+from .tools.download import close_http_session
 from .prompts.handlers import list_prompts as handler_list_prompts
 from .prompts.handlers import get_prompt as handler_get_prompt
 
@@ -42,7 +48,7 @@ async def get_prompt(
 @server.list_tools()
 async def list_tools() -> List[types.Tool]:
     """List available arXiv research tools."""
-    return [search_tool, download_tool, list_tool, read_tool]
+    return [search_tool, download_tool, batch_download_tool, list_tool, read_tool]
 
 
 @server.call_tool()
@@ -53,10 +59,9 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
         if name == "search_papers":
             return await handle_search(arguments)
         elif name == "download_paper":
-            # handle_download is now synchronous, so we need to run it in executor
-            return await asyncio.get_event_loop().run_in_executor(
-                None, lambda: handle_download(arguments)
-            )
+            return await handle_download(arguments)
+        elif name == "download_papers":
+            return await handle_download_batch(arguments)
         elif name == "list_papers":
             return await handle_list_papers(arguments)
         elif name == "read_paper":
@@ -70,16 +75,21 @@ async def call_tool(name: str, arguments: Dict[str, Any]) -> List[types.TextCont
 
 async def main():
     """Run the server async context."""
-    async with stdio_server() as streams:
-        await server.run(
-            streams[0],
-            streams[1],
-            InitializationOptions(
-                server_name=settings.APP_NAME,
-                server_version=settings.APP_VERSION,
-                capabilities=server.get_capabilities(
-                    notification_options=NotificationOptions(resources_changed=True),
-                    experimental_capabilities={},
+    try:
+        async with stdio_server() as streams:
+            await server.run(
+                streams[0],
+                streams[1],
+                InitializationOptions(
+                    server_name=settings.APP_NAME,
+                    server_version=settings.APP_VERSION,
+                    capabilities=server.get_capabilities(
+                        notification_options=NotificationOptions(
+                            resources_changed=True
+                        ),
+                        experimental_capabilities={},
+                    ),
                 ),
-            ),
-        )
\ No newline at end of file
+            )
+    finally:
+        await close_http_session()
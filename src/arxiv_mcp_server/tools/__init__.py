@@ -1,16 +1,23 @@
 """Tool definitions for the arXiv MCP server."""
 
 from .search import search_tool, handle_search
-from .download import download_tool, handle_download
+from .download import (
+    download_tool,
+    batch_download_tool,
+    handle_download,
+    handle_download_batch,
+)
 from .list_papers import list_tool, handle_list_papers
 from .read_paper import read_tool, handle_read_paper
 
 __all__ = [
     "search_tool",
     "download_tool",
+    "batch_download_tool",
     "read_tool",
     "handle_search",
     "handle_download",
+    "handle_download_batch",
     "handle_read_paper",
     "list_tool",
     "handle_list_papers",
@@ -1,12 +1,26 @@
 """Download functionality for the arXiv MCP server."""
 
+import aiofiles
+import aiohttp
 import arxiv
-import json
+import asyncio
+import hashlib
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-from dataclasses import dataclass
-from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
 import mcp.types as types
+import orjson
 from ..config import Settings
 import pymupdf4llm
 import fitz
@@ -15,22 +29,147 @@ import logging
 logger = logging.getLogger("arxiv-mcp-server")
 settings = Settings()
 
-# Global dictionary to track conversion status
-conversion_statuses: Dict[str, Any] = {}
+# Resolved (and created) once; Settings.STORAGE_PATH does this work on every access
+_STORAGE_PATH = Path(settings.STORAGE_PATH)
+_STORAGE_PATH.mkdir(parents=True, exist_ok=True)
+_CACHE_PATH = _STORAGE_PATH / "cache"
+_CACHE_PATH.mkdir(exist_ok=True)
+
+# New-style (2401.12345v2) and old-style (hep-th/9901001) arXiv identifiers
+_ARXIV_ID_RE = re.compile(
+    r"^(\d{4}\.\d{4,5}(v\d+)?|[a-z\-]+(\.[A-Z]{2})?/\d{7}(v\d+)?)$"
+)
+
+# arXiv asks API clients to wait ~3 seconds between metadata queries
+ARXIV_API_DELAY = 3.0
+_api_lock = asyncio.Lock()
+_last_api_call = 0.0
+_arxiv_client: Optional[arxiv.Client] = None
+
+# Shared HTTP session for PDF downloads, created lazily per event loop
+ARXIV_PDF_URL = "https://arxiv.org/pdf/{paper_id}.pdf"
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+_http_session: Optional[aiohttp.ClientSession] = None
+_http_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Markdown output is buffered in 1 MiB blocks to keep write syscalls few
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Worker processes for page-parallel PDF conversion, created on first use
+_conversion_pool: Optional[ProcessPoolExecutor] = None
+_conversion_pool_lock = threading.Lock()
+
+# Background conversions get their own threads so a large batch can't starve
+# the default executor, and run a few at a time as each can fill the process pool
+MAX_BACKGROUND_CONVERSIONS = 2
+_conversion_executor = ThreadPoolExecutor(
+    max_workers=MAX_BACKGROUND_CONVERSIONS, thread_name_prefix="conversion"
+)
+
+# Conversions running in the background, kept so callers and tests can await them
+_conversion_tasks: Set[asyncio.Future] = set()
 
 fitz.TOOLS.mupdf_display_errors(False)
 fitz.TOOLS.mupdf_display_warnings(False)
 
 
-@dataclass
+@dataclass(slots=True)
 class ConversionStatus:
     """Track the status of a PDF to Markdown conversion."""
 
     paper_id: str
     status: str  # 'downloading', 'converting', 'success', 'error'
-    started_at: datetime
-    completed_at: Optional[datetime] = None
+    started_at_iso: str  # timestamps are formatted once, not on every poll
+    completed_at_iso: Optional[str] = None
     error: Optional[str] = None
+    pages_done: int = 0
+    total_pages: Optional[int] = None
+
+
+class StatusStore:
+    """Thread-safe, size-bounded store of conversion statuses.
+
+    Finished conversions are dropped after ``ttl`` and the oldest finished
+    entries are evicted once ``maxlen`` is exceeded, so memory stays bounded in
+    a long-running server. In-flight conversions are never evicted.
+    """
+
+    def __init__(self, maxlen: int = 1024, ttl: timedelta = timedelta(hours=1)):
+        self._statuses: OrderedDict[str, ConversionStatus] = OrderedDict()
+        self._lock = threading.Lock()
+        self.maxlen = maxlen
+        self.ttl = ttl
+
+    def __contains__(self, paper_id: str) -> bool:
+        with self._lock:
+            return paper_id in self._statuses
+
+    def get(self, paper_id: str) -> Optional[ConversionStatus]:
+        """Get a consistent snapshot of a paper's status, if tracked."""
+        with self._lock:
+            status = self._statuses.get(paper_id)
+            return replace(status) if status else None
+
+    def set(self, status: ConversionStatus) -> None:
+        """Start tracking a status, evicting expired and excess entries."""
+        with self._lock:
+            self._statuses[status.paper_id] = status
+            self._statuses.move_to_end(status.paper_id)
+            self._sweep()
+
+    def update(self, paper_id: str, **fields: Any) -> None:
+        """Update fields of a tracked status; untracked papers are ignored."""
+        with self._lock:
+            status = self._statuses.get(paper_id)
+            if status:
+                for name, value in fields.items():
+                    setattr(status, name, value)
+
+    def in_flight(self, paper_id: str) -> Dict[str, ConversionStatus]:
+        """Get snapshots of a paper's running downloads and conversions.
+
+        This includes page-limited conversions, which are keyed
+        ``"<paper_id>:p<N>"``.
+        """
+        with self._lock:
+            return {
+                key: replace(status)
+                for key, status in self._statuses.items()
+                if key.split(":")[0] == paper_id
+                and status.status in ("downloading", "converting")
+            }
+
+    def pop(self, paper_id: str) -> Optional[ConversionStatus]:
+        """Stop tracking a paper and return its last status."""
+        with self._lock:
+            return self._statuses.pop(paper_id, None)
+
+    def clear(self) -> None:
+        """Forget all tracked statuses."""
+        with self._lock:
+            self._statuses.clear()
+
+    def _sweep(self) -> None:
+        # ISO timestamps of the same clock order correctly as plain strings
+        expired_before = (datetime.now() - self.ttl).isoformat()
+        for paper_id, status in list(self._statuses.items()):
+            if status.completed_at_iso and status.completed_at_iso < expired_before:
+                del self._statuses[paper_id]
+        # Past the size cap, drop the oldest finished entries; in-flight ones
+        # are kept so clients polling a running conversion never lose it
+        excess = len(self._statuses) - self.maxlen
+        if excess > 0:
+            finished = [
+                paper_id
+                for paper_id, status in self._statuses.items()
+                if status.completed_at_iso
+            ]
+            for paper_id in finished[:excess]:
+                del self._statuses[paper_id]
+
+
+# Global store to track conversion status
+conversion_statuses = StatusStore()
 
 
 download_tool = types.Tool(
@@ -48,200 +187,557 @@ download_tool = types.Tool(
                 "description": "If true, only check conversion status without downloading",
                 "default": False,
             },
+            "return_content": {
+                "type": "boolean",
+                "description": "If true, include the converted markdown in the response",
+                "default": False,
+            },
+            "max_pages": {
+                "type": "integer",
+                "description": "Only convert the first N pages of the paper",
+                "minimum": 1,
+            },
         },
         "required": ["paper_id"],
     },
 )
 
+batch_download_tool = types.Tool(
+    name="download_papers",
+    description="Download several papers concurrently and create resources for them",
+    inputSchema={
+        "type": "object",
+        "properties": {
+            "paper_ids": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "The arXiv IDs of the papers to download",
+            },
+            "max_concurrency": {
+                "type": "integer",
+                "description": "Maximum number of papers downloaded at the same time; conversions continue in the background",
+                "default": 8,
+                "minimum": 1,
+            },
+        },
+        "required": ["paper_ids"],
+    },
+)
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize a response payload to a JSON string."""
+    return orjson.dumps(obj).decode()
+
 
 def get_paper_path(paper_id: str, suffix: str = ".md") -> Path:
     """Get the absolute file path for a paper with given suffix."""
-    storage_path = Path(settings.STORAGE_PATH)
-    storage_path.mkdir(parents=True, exist_ok=True)
-    return storage_path / f"{paper_id}{suffix}"
+    return _STORAGE_PATH / f"{paper_id}{suffix}"
+
+
+def _get_client() -> arxiv.Client:
+    """Get the shared arXiv client so its HTTP connection is reused."""
+    global _arxiv_client
+    if _arxiv_client is None:
+        _arxiv_client = arxiv.Client(page_size=100, delay_seconds=3, num_retries=3)
+    return _arxiv_client
+
+
+def _search_paper(paper_id: str) -> Optional[arxiv.Result]:
+    """Look up a single paper on arXiv, returning None if it does not exist."""
+    client = _get_client()
+    try:
+        return next(client.results(arxiv.Search(id_list=[paper_id])))
+    except StopIteration:
+        return None
+
+
+async def _lookup_paper(paper_id: str) -> Optional[arxiv.Result]:
+    """Query arXiv metadata, spacing calls out to respect the API rate limit."""
+    global _last_api_call
+    async with _api_lock:
+        loop = asyncio.get_running_loop()
+        wait = _last_api_call + ARXIV_API_DELAY - loop.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        try:
+            return await asyncio.to_thread(_search_paper, paper_id)
+        finally:
+            _last_api_call = loop.time()
+
+
+def get_cache_path(pdf_path: Path, max_pages: Optional[int] = None) -> Path:
+    """Get the cached markdown path keyed by the SHA-256 of the PDF contents.
+
+    The cache is not evicted; full conversions are hard links to the paper's
+    markdown, so only page-limited conversions take up extra disk.
+    """
+    with open(pdf_path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+    if max_pages is not None:
+        return _CACHE_PATH / f"{digest}.p{max_pages}.md"
+    return _CACHE_PATH / f"{digest}.md"
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """Hard-link ``dst`` to ``src``, copying where links are unsupported."""
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _get_http_session() -> aiohttp.ClientSession:
+    """Get the shared HTTP session, creating it for the running event loop."""
+    global _http_session, _http_session_loop
+    loop = asyncio.get_running_loop()
+    if _http_session is None or _http_session.closed or _http_session_loop is not loop:
+        _http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=16),
+            timeout=aiohttp.ClientTimeout(sock_read=settings.REQUEST_TIMEOUT),
+        )
+        _http_session_loop = loop
+    return _http_session
+
+
+async def close_http_session() -> None:
+    """Close the shared HTTP session if one is open."""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
 
 
-def convert_pdf_to_markdown(paper_id: str, pdf_path: Path) -> None:
-    """Convert PDF to Markdown in a separate thread."""
+async def _download_pdf(url: str, pdf_path: Path) -> None:
+    """Stream a PDF to disk in chunks without blocking the event loop."""
+    tmp_path = pdf_path.with_suffix(".pdf.tmp")
+    try:
+        async with _get_http_session().get(url) as response:
+            response.raise_for_status()
+            async with aiofiles.open(tmp_path, "wb") as f:
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    await f.write(chunk)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_path, pdf_path)
+
+
+async def _fetch_pdf(paper_id: str, pdf_path: Path) -> bool:
+    """Download a paper's PDF, returning False if arXiv does not have it.
+
+    The canonical PDF URL is tried directly; the arXiv API is only queried
+    when that returns 404, in case the PDF lives at a different path.
+    """
+    try:
+        await _download_pdf(ARXIV_PDF_URL.format(paper_id=paper_id), pdf_path)
+        return True
+    except aiohttp.ClientResponseError as e:
+        if e.status != 404:
+            raise
+
+    paper = await _lookup_paper(paper_id)
+    if paper is None or not paper.pdf_url:
+        return False
+    await _download_pdf(paper.pdf_url, pdf_path)
+    return True
+
+
+def _markdown_options() -> Dict[str, Any]:
+    """Get pymupdf4llm options, skipping image work unless images are wanted.
+
+    Vector graphics are still analysed, as table detection depends on them.
+    """
+    if settings.EXTRACT_IMAGES:
+        return {}
+    return {"write_images": False, "embed_images": False, "ignore_images": True}
+
+
+def _get_conversion_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool used for page-parallel conversion."""
+    global _conversion_pool
+    with _conversion_pool_lock:
+        if _conversion_pool is None:
+            # Spawned workers don't inherit the server's threads, locks or
+            # sockets, which a fork of this multi-threaded process would copy
+            _conversion_pool = ProcessPoolExecutor(
+                max_workers=settings.CONVERSION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _conversion_pool
+
+
+def _reset_conversion_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next conversion starts a fresh one."""
+    global _conversion_pool
+    with _conversion_pool_lock:
+        if _conversion_pool is pool:
+            _conversion_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _convert_page_range(pdf_path: str, pages: range, options: Dict[str, Any]) -> str:
+    """Convert a run of pages to markdown; runs inside a worker process."""
+    with fitz.open(pdf_path) as doc:
+        hdr_info = pymupdf4llm.IdentifyHeaders(doc)
+        return "".join(
+            pymupdf4llm.to_markdown(
+                doc, pages=[i], hdr_info=hdr_info, show_progress=False, **options
+            )
+            for i in pages
+        )
+
+
+def _iter_markdown_chunks(
+    pdf_path: Path, total: int, options: Dict[str, Any]
+) -> Iterator[Tuple[int, str]]:
+    """Yield ``(page_count, markdown)`` chunks for the first pages, in order.
+
+    Pages are spread across the conversion process pool when more than one
+    worker is configured; otherwise they are converted one at a time here.
+    """
+    workers = settings.CONVERSION_WORKERS
+    if workers <= 1 or total < 2:
+        yield from _iter_pages_serially(pdf_path, range(total), options)
+        return
+
+    # Several small chunks per worker keep the pool busy and progress granular
+    size = math.ceil(total / (workers * 4))
+    chunks = [range(start, min(start + size, total)) for start in range(0, total, size)]
+    pool = _get_conversion_pool()
+    done = 0
+    try:
+        results = pool.map(
+            _convert_page_range, repeat(str(pdf_path)), chunks, repeat(options)
+        )
+        for pages, markdown in zip(chunks, results):
+            yield len(pages), markdown
+            done = pages.stop
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); finish the remaining pages
+        # here and let the next conversion start a fresh pool
+        logger.warning(f"Conversion pool broke at page {done}; continuing serially")
+        _reset_conversion_pool(pool)
+        yield from _iter_pages_serially(pdf_path, range(done, total), options)
+
+
+def _iter_pages_serially(
+    pdf_path: Path, pages: range, options: Dict[str, Any]
+) -> Iterator[Tuple[int, str]]:
+    """Yield ``(1, markdown)`` for each page, converted in this process."""
+    with fitz.open(pdf_path) as doc:
+        # to_markdown scans the whole document for header font sizes unless
+        # given the result, so do that once rather than once per page
+        hdr_info = pymupdf4llm.IdentifyHeaders(doc)
+        for i in pages:
+            yield 1, pymupdf4llm.to_markdown(
+                doc, pages=[i], hdr_info=hdr_info, show_progress=False, **options
+            )
+
+
+def _status_key(paper_id: str, max_pages: Optional[int] = None) -> str:
+    """Get the status key for a conversion.
+
+    Page-limited conversions are tracked under their own key so they never
+    stand in for the status of the paper itself.
+    """
+    return paper_id if max_pages is None else f"{paper_id}:p{max_pages}"
+
+
+def convert_pdf_to_markdown(
+    paper_id: str, pdf_path: Path, max_pages: Optional[int] = None
+) -> Optional[Path]:
+    """Convert PDF to Markdown in a separate thread.
+
+    When ``max_pages`` is given only the leading pages are converted, and the
+    partial result is kept in the conversion cache instead of being stored as
+    the paper itself. Returns the markdown path, or None if conversion failed.
+    """
+    key = _status_key(paper_id, max_pages)
     try:
         logger.info(f"Starting conversion for {paper_id}")
-        markdown = pymupdf4llm.to_markdown(pdf_path, show_progress=False)
-        md_path = get_paper_path(paper_id, ".md")
+        cache_path = get_cache_path(pdf_path, max_pages)
+        md_path = get_paper_path(paper_id, ".md") if max_pages is None else cache_path
 
-        with open(md_path, "w", encoding="utf-8") as f:
-            f.write(markdown)
+        if cache_path.exists():
+            logger.info(f"Reusing cached conversion for {paper_id}")
+            if md_path != cache_path:
+                _link_or_copy(cache_path, md_path)
+        else:
+            # Convert page by page so memory stays bounded and progress is visible
+            tmp_path = md_path.with_suffix(".md.tmp")
+            with fitz.open(pdf_path) as doc:
+                total = doc.page_count
+            if max_pages is not None:
+                total = min(total, max_pages)
+            conversion_statuses.update(key, total_pages=total)
 
-        status = conversion_statuses.get(paper_id)
-        if status:
-            status.status = "success"
-            status.completed_at = datetime.now()
+            pages_done = 0
+            try:
+                with open(
+                    tmp_path, "w", encoding="utf-8", buffering=WRITE_BUFFER_SIZE
+                ) as f:
+                    for pages, markdown in _iter_markdown_chunks(
+                        pdf_path, total, _markdown_options()
+                    ):
+                        f.write(markdown)
+                        pages_done += pages
+                        conversion_statuses.update(key, pages_done=pages_done)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            os.replace(tmp_path, md_path)
+            if md_path != cache_path:
+                _link_or_copy(md_path, cache_path)
 
-        # Clean up PDF after successful conversion
+        conversion_statuses.update(
+            key, status="success", completed_at_iso=datetime.now().isoformat()
+        )
+
+        # Clean up the PDF once the whole paper is converted, which a partial
+        # conversion may find already done; other conversions of the paper
+        # still reading the PDF leave that to whichever finishes last
+        if (
+            not settings.KEEP_PDF
+            and get_paper_path(paper_id, ".md").exists()
+            and not conversion_statuses.in_flight(paper_id).keys() - {key}
+        ):
+            try:
+                pdf_path.unlink()
+            except OSError as e:
+                logger.warning(f"Could not remove PDF for {paper_id}: {e}")
         logger.info(f"Conversion completed for {paper_id}")
+        return md_path
 
     except Exception as e:
         logger.error(f"Conversion failed for {paper_id}: {str(e)}")
-        status = conversion_statuses.get(paper_id)
-        if status:
-            status.status = "error"
-            status.completed_at = datetime.now()
-            status.error = str(e)
+        conversion_statuses.update(
+            key,
+            status="error",
+            completed_at_iso=datetime.now().isoformat(),
+            error=str(e),
+        )
+        return None
+
+
+async def _read_markdown(md_path: Path) -> str:
+    """Read converted markdown without blocking the event loop."""
+    return await asyncio.to_thread(md_path.read_text, encoding="utf-8")
+
+
+def _start_conversion(paper_id: str, pdf_path: Path) -> None:
+    """Run a full conversion in the background; progress is tracked by status.
+
+    Conversions beyond ``MAX_BACKGROUND_CONVERSIONS`` queue up, reporting
+    ``converting`` with no pages done until they start.
+    """
+    task = asyncio.get_running_loop().run_in_executor(
+        _conversion_executor, convert_pdf_to_markdown, paper_id, pdf_path
+    )
+    _conversion_tasks.add(task)
+    task.add_done_callback(_conversion_tasks.discard)
+
+
+def _payload(status: str, message: str, **extra: Any) -> Dict[str, Any]:
+    """Build a download tool payload, omitting fields that are None."""
+    payload = {"status": status, "message": message}
+    payload.update((key, value) for key, value in extra.items() if value is not None)
+    return payload
+
+
+def _response(status: str, message: str, **extra: Any) -> List[types.TextContent]:
+    """Build a download tool response, omitting fields that are None."""
+    return [
+        types.TextContent(type="text", text=_dumps(_payload(status, message, **extra)))
+    ]
 
 
-def handle_download(arguments: Dict[str, Any]) -> List[types.TextContent]:
-    """Handle paper download and conversion requests synchronously."""
+async def handle_download(arguments: Dict[str, Any]) -> List[types.TextContent]:
+    """Handle paper download and conversion requests."""
+    return [types.TextContent(type="text", text=_dumps(await _download(arguments)))]
+
+
+async def _download(arguments: Dict[str, Any]) -> Dict[str, Any]:
+    """Download and convert a paper, returning the response payload."""
     try:
         paper_id = arguments["paper_id"]
+        if not _ARXIV_ID_RE.match(paper_id):
+            return _payload("error", f"Invalid arXiv ID: {paper_id}")
+
         check_status = arguments.get("check_status", False)
+        return_content = arguments.get("return_content", False)
+        max_pages = arguments.get("max_pages")
+        md_path = get_paper_path(paper_id, ".md")
 
         # If only checking status
         if check_status:
             status = conversion_statuses.get(paper_id)
             if not status:
-                if get_paper_path(paper_id, ".md").exists():
-                    return [
-                        types.TextContent(
-                            type="text",
-                            text=json.dumps(
-                                {
-                                    "status": "success",
-                                    "message": "Paper is ready",
-                                    "resource_uri": f"file://{get_paper_path(paper_id, '.md')}",
-                                }
-                            ),
-                        )
-                    ]
-                return [
-                    types.TextContent(
-                        type="text",
-                        text=json.dumps(
-                            {
-                                "status": "unknown",
-                                "message": "No download or conversion in progress",
-                            }
-                        ),
+                if md_path.exists():
+                    return _payload(
+                        "success",
+                        "Paper is ready",
+                        resource_uri=f"file://{md_path}",
                     )
-                ]
-
-            return [
-                types.TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "status": status.status,
-                            "started_at": status.started_at.isoformat(),
-                            "completed_at": (
-                                status.completed_at.isoformat()
-                                if status.completed_at
-                                else None
-                            ),
-                            "error": status.error,
-                            "message": f"Paper conversion {status.status}",
-                        }
-                    ),
-                )
-            ]
-
-        # Check if paper is already converted
-        if get_paper_path(paper_id, ".md").exists():
-            return [
-                types.TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "status": "success",
-                            "message": "Paper already available",
-                            "resource_uri": f"file://{get_paper_path(paper_id, '.md')}",
-                        }
-                    ),
-                )
-            ]
+                return _payload("unknown", "No download or conversion in progress")
 
-        # Check if already in progress
-        if paper_id in conversion_statuses:
-            status = conversion_statuses[paper_id]
-            return [
-                types.TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "status": status.status,
-                            "message": f"Paper conversion {status.status}",
-                            "started_at": status.started_at.isoformat(),
-                        }
-                    ),
-                )
-            ]
+            ready = status.status == "success" and md_path.exists()
+            return _payload(
+                status.status,
+                f"Paper conversion {status.status}",
+                started_at=status.started_at_iso,
+                completed_at=status.completed_at_iso,
+                error=status.error,
+                pages_done=status.pages_done,
+                total_pages=status.total_pages,
+                resource_uri=f"file://{md_path}" if ready else None,
+            )
 
-        # Start new download and conversion
-        pdf_path = get_paper_path(paper_id, ".pdf")
-        client = arxiv.Client()
+        # Check if paper is already converted; a page-limited request still
+        # converts its leading pages so the response stays small
+        if md_path.exists() and max_pages is None:
+            return _payload(
+                "success",
+                "Paper already available",
+                resource_uri=f"file://{md_path}",
+                content=await _read_markdown(md_path) if return_content else None,
+            )
 
-        # Initialize status
-        conversion_statuses[paper_id] = ConversionStatus(
-            paper_id=paper_id, status="downloading", started_at=datetime.now()
+        # Check if already in progress, either for the paper or this page
+        # limit; any download also blocks others, since they share the PDF
+        key = _status_key(paper_id, max_pages)
+        in_flight = conversion_statuses.in_flight(paper_id)
+        status = (
+            in_flight.get(paper_id)
+            or in_flight.get(key)
+            or next((s for s in in_flight.values() if s.status == "downloading"), None)
         )
+        if status:
+            return _payload(
+                status.status,
+                f"Paper conversion {status.status}",
+                started_at=status.started_at_iso,
+            )
 
-        # Download PDF
-        paper = next(client.results(arxiv.Search(id_list=[paper_id])))
-        paper.download_pdf(dirpath=pdf_path.parent, filename=pdf_path.name)
-
-        # Update status and perform conversion synchronously
-        status = conversion_statuses[paper_id]
-        status.status = "converting"
-
-        # Perform conversion synchronously (blocking)
-        convert_pdf_to_markdown(paper_id, pdf_path)
-
-        # Return final status after conversion is complete
-        status = conversion_statuses[paper_id]
-        if status.status == "success":
-            return [
-                types.TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "status": "success",
-                            "message": "Paper downloaded and converted successfully",
-                            "resource_uri": f"file://{get_paper_path(paper_id, '.md')}",
-                            "started_at": status.started_at.isoformat(),
-                            "completed_at": status.completed_at.isoformat(),
-                        }
-                    ),
+        pdf_path = get_paper_path(paper_id, ".pdf")
+        if pdf_path.exists():
+            # PDF already on disk: skip the arXiv API and go straight to conversion,
+            # which is served from the content-hash cache when possible
+            conversion_statuses.set(
+                ConversionStatus(
+                    paper_id=key,
+                    status="converting",
+                    started_at_iso=datetime.now().isoformat(),
                 )
-            ]
+            )
         else:
-            return [
-                types.TextContent(
-                    type="text",
-                    text=json.dumps(
-                        {
-                            "status": "error",
-                            "message": f"Conversion failed: {status.error}",
-                            "started_at": status.started_at.isoformat(),
-                            "completed_at": status.completed_at.isoformat(),
-                            "error": status.error,
-                        }
-                    ),
+            # Start new download and conversion
+            conversion_statuses.set(
+                ConversionStatus(
+                    paper_id=key,
+                    status="downloading",
+                    started_at_iso=datetime.now().isoformat(),
                 )
-            ]
+            )
+
+            # Download PDF
+            try:
+                found = await _fetch_pdf(paper_id, pdf_path)
+            except asyncio.CancelledError:
+                # Nothing will finish this download, so don't leave it looking
+                # in flight; a later request starts over
+                conversion_statuses.pop(key)
+                raise
+            except Exception as e:
+                conversion_statuses.update(
+                    key,
+                    status="error",
+                    completed_at_iso=datetime.now().isoformat(),
+                    error=str(e),
+                )
+                raise
+            if not found:
+                conversion_statuses.pop(key)
+                return _payload("error", f"Paper {paper_id} not found on arXiv")
+
+            # Update status and perform conversion off the event loop
+            conversion_statuses.update(key, status="converting")
+
+        # Full conversions can take minutes, so return now and let clients poll
+        # with check_status; partial or inline-content requests wait for the result
+        if max_pages is None and not return_content:
+            _start_conversion(paper_id, pdf_path)
+            status = conversion_statuses.get(paper_id)
+            return _payload(
+                "converting",
+                "Paper conversion started; poll with check_status",
+                started_at=status.started_at_iso,
+            )
+
+        md_path = await asyncio.to_thread(
+            convert_pdf_to_markdown, paper_id, pdf_path, max_pages
+        )
+
+        # Return final status after conversion is complete; the entry may have
+        # been cleared meanwhile, in which case timestamps are simply omitted
+        status = conversion_statuses.get(key)
+        times = (
+            {
+                "started_at": status.started_at_iso,
+                "completed_at": status.completed_at_iso,
+            }
+            if status
+            else {}
+        )
+        if md_path is not None:
+            return _payload(
+                "success",
+                "Paper downloaded and converted successfully",
+                resource_uri=f"file://{md_path}",
+                content=await _read_markdown(md_path) if return_content else None,
+                **times,
+            )
+        error = status.error if status else None
+        return _payload(
+            "error",
+            f"Conversion failed: {error}" if error else "Conversion failed",
+            error=error,
+            **times,
+        )
+
+    except Exception as e:
+        return _payload("error", f"Error: {str(e)}")
+
+
+async def handle_download_batch(
+    arguments: Dict[str, Any],
+) -> List[types.TextContent]:
+    """Handle requests to download and convert several papers concurrently."""
+    try:
+        paper_ids = arguments["paper_ids"]
+        max_concurrency = max(1, arguments.get("max_concurrency", 8))
+        sem = asyncio.Semaphore(max_concurrency)
+
+        async def _one(paper_id: str) -> Dict[str, Any]:
+            async with sem:
+                payload = await _download({"paper_id": paper_id})
+            return {"paper_id": paper_id, **payload}
+
+        async with asyncio.TaskGroup() as tg:
+            tasks = [tg.create_task(_one(paper_id)) for paper_id in paper_ids]
 
-    except StopIteration:
         return [
             types.TextContent(
                 type="text",
-                text=json.dumps(
+                text=_dumps(
                     {
-                        "status": "error",
-                        "message": f"Paper {paper_id} not found on arXiv",
+                        "total_papers": len(paper_ids),
+                        "papers": [task.result() for task in tasks],
                     }
                 ),
             )
         ]
+
     except Exception as e:
-        return [
-            types.TextContent(
-                type="text",
-                text=json.dumps({"status": "error", "message": f"Error: {str(e)}"}),
-            )
-        ]
+        return _response("error", f"Error: {str(e)}")
@@ -0,0 +1,37 @@
+"""Test fixtures for tool tests."""
+
+import pytest
+from unittest.mock import PropertyMock
+from arxiv_mcp_server.config import Settings
+
+
+@pytest.fixture(autouse=True)
+def no_arxiv_api_delay(mocker):
+    """Disable the arXiv API politeness delay so tests don't sleep."""
+    mocker.patch("arxiv_mcp_server.tools.download.ARXIV_API_DELAY", 0)
+
+
+@pytest.fixture(autouse=True)
+def isolated_storage(mocker, temp_storage_path):
+    """Point paper storage at a temporary directory for every tool test."""
+    mocker.patch.object(
+        Settings,
+        "STORAGE_PATH",
+        new_callable=PropertyMock,
+        return_value=temp_storage_path,
+    )
+    mocker.patch("arxiv_mcp_server.tools.download._STORAGE_PATH", temp_storage_path)
+    cache_path = temp_storage_path / "cache"
+    cache_path.mkdir(exist_ok=True)
+    mocker.patch("arxiv_mcp_server.tools.download._CACHE_PATH", cache_path)
+    return temp_storage_path
+
+
+@pytest.fixture(autouse=True)
+def reset_conversion_statuses():
+    """Forget conversion state left behind by earlier tests."""
+    from arxiv_mcp_server.tools.download import conversion_statuses
+
+    conversion_statuses.clear()
+    yield
+    conversion_statuses.clear()
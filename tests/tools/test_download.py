@@ -1,49 +1,82 @@
 """Tests for paper download functionality."""
 
+import asyncio
+import threading
+import time
 import pytest
 import json
-from datetime import datetime
+import fitz
+import pymupdf4llm
+from aioresponses import aioresponses
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from arxiv_mcp_server.tools import download
 from arxiv_mcp_server.tools.download import (
     handle_download,
+    handle_download_batch,
+    convert_pdf_to_markdown,
     get_paper_path,
     conversion_statuses,
+    ConversionStatus,
+    StatusStore,
+    settings,
 )
 
 
+def _make_pdf(path, pages):
+    """Write a small PDF with one line of text per page."""
+    with fitz.open() as doc:
+        for i in range(pages):
+            doc.new_page().insert_text((72, 72), f"Page {i + 1}")
+        doc.save(path)
+    return path
+
+
+async def _wait_for_conversions():
+    """Wait for background conversions started by handle_download."""
+    await asyncio.gather(*download._conversion_tasks)
+
+
 @pytest.mark.asyncio
 async def test_download_paper_lifecycle(mocker, temp_storage_path):
     """Test the complete lifecycle of downloading and converting a paper."""
     paper_id = "2103.12345"
-    # Mock arxiv client and PDF download
-    mocker.patch("arxiv.Client.results")
-    mocker.patch("arxiv.Result.download_pdf")
+    # The PDF is fetched directly, without an arXiv API lookup
+    results = mocker.patch("arxiv.Client.results")
 
     # Mock PDF to markdown conversion to happen immediately
-    async def mock_convert(paper_id, pdf_path):
+    def mock_convert(paper_id, pdf_path, max_pages=None):
         md_path = get_paper_path(paper_id, ".md")
         with open(md_path, "w", encoding="utf-8") as f:
             f.write("# Test Paper\nConverted content")
-        if paper_id in conversion_statuses:
-            status = conversion_statuses[paper_id]
-            status.status = "success"
-            status.completed_at = datetime.now()
-        pdf_path.unlink()  # Cleanup PDF
+        conversion_statuses.update(
+            paper_id, status="success", completed_at_iso=datetime.now().isoformat()
+        )
+        return md_path
 
-    mocker.patch("asyncio.to_thread", side_effect=mock_convert)
+    mocker.patch(
+        "arxiv_mcp_server.tools.download.convert_pdf_to_markdown",
+        side_effect=mock_convert,
+    )
 
     # Initial download request
-    response = await handle_download({"paper_id": paper_id})
+    with aioresponses() as pdf_server:
+        pdf_server.get(
+            f"https://arxiv.org/pdf/{paper_id}.pdf", body=b"Mock PDF Content"
+        )
+        response = await handle_download({"paper_id": paper_id})
     status = json.loads(response[0].text)
     assert status["status"] in ["converting", "success"]
+    results.assert_not_called()
 
-    # Check final status
+    # Check final status once the background conversion has finished
+    await _wait_for_conversions()
     response = await handle_download({"paper_id": paper_id, "check_status": True})
     final_status = json.loads(response[0].text)
-    assert final_status["status"] in ["success", "converting"]
-
-    # Verify markdown file exists
-    if final_status["status"] == "success":
-        assert get_paper_path(paper_id, ".md").exists()
+    assert final_status["status"] == "success"
+    assert final_status["resource_uri"].endswith(f"{paper_id}.md")
+    assert get_paper_path(paper_id, ".md").exists()
 
 
 @pytest.mark.asyncio
@@ -62,20 +95,452 @@ async def test_download_existing_paper(temp_storage_path):
     assert status["status"] == "success"
 
 
+@pytest.mark.asyncio
+async def test_download_existing_pdf_skips_arxiv(mocker, temp_storage_path):
+    """Test that a PDF already on disk is converted without querying arXiv."""
+    paper_id = "2103.12345"
+    _make_pdf(get_paper_path(paper_id, ".pdf"), pages=2)
+    results = mocker.patch("arxiv.Client.results")
+
+    response = await handle_download({"paper_id": paper_id})
+    status = json.loads(response[0].text)
+    assert status["status"] == "converting"
+    await _wait_for_conversions()
+    assert get_paper_path(paper_id, ".md").exists()
+    results.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_download_max_pages_returns_content(temp_storage_path):
+    """Test that max_pages limits conversion and return_content inlines it."""
+    paper_id = "2103.12345"
+    _make_pdf(get_paper_path(paper_id, ".pdf"), pages=5)
+
+    response = await handle_download(
+        {"paper_id": paper_id, "max_pages": 2, "return_content": True}
+    )
+    status = json.loads(response[0].text)
+    assert status["status"] == "success"
+    assert "Page 2" in status["content"]
+    assert "Page 3" not in status["content"]
+    # A partial conversion must not be stored as the paper itself
+    assert not get_paper_path(paper_id, ".md").exists()
+    response = await handle_download({"paper_id": paper_id, "check_status": True})
+    assert json.loads(response[0].text)["status"] == "unknown"
+
+    response = await handle_download({"paper_id": paper_id})
+    status = json.loads(response[0].text)
+    assert status["status"] == "converting"
+    assert "content" not in status
+    await _wait_for_conversions()
+    assert "Page 5" in get_paper_path(paper_id, ".md").read_text(encoding="utf-8")
+
+
+@pytest.mark.asyncio
+async def test_download_max_pages_ignores_full_markdown(mocker, temp_storage_path):
+    """Test that max_pages is honoured even when the full paper is converted."""
+    paper_id = "2103.12345"
+    mocker.patch.object(settings, "KEEP_PDF", True)
+    _make_pdf(get_paper_path(paper_id, ".pdf"), pages=3)
+    get_paper_path(paper_id, ".md").write_text(
+        "Page 1\nPage 2\nPage 3", encoding="utf-8"
+    )
+
+    response = await handle_download(
+        {"paper_id": paper_id, "max_pages": 1, "return_content": True}
+    )
+    status = json.loads(response[0].text)
+    assert status["status"] == "success"
+    assert "Page 1" in status["content"]
+    assert "Page 2" not in status["content"]
+
+
+@pytest.mark.asyncio
+async def test_download_survives_cleared_status(mocker, temp_storage_path):
+    """Test that a status evicted mid-conversion doesn't break the response."""
+    paper_id = "2103.12345"
+    _make_pdf(get_paper_path(paper_id, ".pdf"), pages=1)
+
+    def mock_convert(paper_id, pdf_path, max_pages=None):
+        conversion_statuses.clear()
+        return None
+
+    mocker.patch(
+        "arxiv_mcp_server.tools.download.convert_pdf_to_markdown",
+        side_effect=mock_convert,
+    )
+    response = await handle_download({"paper_id": paper_id, "return_content": True})
+    status = json.loads(response[0].text)
+    assert status == {"status": "error", "message": "Conversion failed"}
+
+
+@pytest.mark.asyncio
+async def test_download_waits_for_shared_pdf_download():
+    """Test that a full request doesn't refetch a PDF a partial one is fetching."""
+    conversion_statuses.set(
+        ConversionStatus("2103.12345:p1", "downloading", datetime.now().isoformat())
+    )
+    response = await handle_download({"paper_id": "2103.12345"})
+    assert json.loads(response[0].text)["status"] == "downloading"
+
+
+@pytest.mark.asyncio
+async def test_download_cancelled_does_not_stay_in_flight(mocker):
+    """Test that a cancelled download can be requested again."""
+    started = asyncio.Event()
+
+    async def mock_fetch(paper_id, pdf_path):
+        started.set()
+        await asyncio.Event().wait()
+
+    mocker.patch("arxiv_mcp_server.tools.download._fetch_pdf", side_effect=mock_fetch)
+    task = asyncio.create_task(handle_download({"paper_id": "2103.12345"}))
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    response = await handle_download({"paper_id": "2103.12345", "check_status": True})
+    assert json.loads(response[0].text)["status"] == "unknown"
+
+    mocker.patch("arxiv_mcp_server.tools.download._fetch_pdf", return_value=False)
+    response = await handle_download({"paper_id": "2103.12345"})
+    assert "not found on arXiv" in json.loads(response[0].text)["message"]
+
+
 @pytest.mark.asyncio
 async def test_download_nonexistent_paper(mocker):
     """Test downloading a paper that doesn't exist."""
     mocker.patch("arxiv.Client.results", side_effect=StopIteration())
 
-    response = await handle_download({"paper_id": "invalid.12345"})
+    with aioresponses() as pdf_server:
+        pdf_server.get("https://arxiv.org/pdf/2103.99999.pdf", status=404)
+        response = await handle_download({"paper_id": "2103.99999"})
     status = json.loads(response[0].text)
     assert status["status"] == "error"
     assert "not found on arXiv" in status["message"]
 
 
+@pytest.mark.asyncio
+async def test_download_falls_back_to_api_pdf_url(mocker, mock_paper):
+    """Test that a 404 on the direct URL falls back to the API's PDF link."""
+    paper_id = "2103.12345"
+    mocker.patch("arxiv.Client.results", return_value=iter([mock_paper]))
+    mocker.patch(
+        "arxiv_mcp_server.tools.download.convert_pdf_to_markdown",
+        return_value=get_paper_path(paper_id, ".md"),
+    )
+
+    with aioresponses() as pdf_server:
+        pdf_server.get(f"https://arxiv.org/pdf/{paper_id}.pdf", status=404)
+        pdf_server.get(mock_paper.pdf_url, body=b"Mock PDF Content")
+        await handle_download({"paper_id": paper_id})
+
+    assert get_paper_path(paper_id, ".pdf").read_bytes() == b"Mock PDF Content"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("paper_id", ["invalid.12345", "foo bar", "2401.9999999"])
+async def test_download_invalid_paper_id(mocker, paper_id):
+    """Test that malformed IDs are rejected without querying arXiv."""
+    results = mocker.patch("arxiv.Client.results")
+
+    response = await handle_download({"paper_id": paper_id})
+    status = json.loads(response[0].text)
+    assert status["status"] == "error"
+    assert "Invalid arXiv ID" in status["message"]
+    results.assert_not_called()
+
+
 @pytest.mark.asyncio
 async def test_check_unknown_status():
     """Test checking status of unknown paper."""
     response = await handle_download({"paper_id": "2103.99999", "check_status": True})
     status = json.loads(response[0].text)
     assert status["status"] == "unknown"
+
+
+@pytest.mark.asyncio
+async def test_download_batch(mocker):
+    """Test downloading several papers concurrently."""
+
+    async def mock_download(arguments):
+        return {"status": "success", "message": "ok"}
+
+    mock = mocker.patch(
+        "arxiv_mcp_server.tools.download._download", side_effect=mock_download
+    )
+
+    paper_ids = ["2103.12345", "2103.67890", "2103.11111"]
+    response = await handle_download_batch(
+        {"paper_ids": paper_ids, "max_concurrency": 2}
+    )
+    result = json.loads(response[0].text)
+    assert result["total_papers"] == 3
+    assert [p["paper_id"] for p in result["papers"]] == paper_ids
+    assert all(p["status"] == "success" for p in result["papers"])
+    assert mock.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_download_batch_bounds_concurrency(mocker):
+    """Test that max_concurrency caps how many downloads run at once."""
+    active = 0
+    peak = 0
+
+    async def mock_download(arguments):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return {"status": "success", "message": "ok"}
+
+    mocker.patch("arxiv_mcp_server.tools.download._download", side_effect=mock_download)
+
+    paper_ids = [f"2103.1234{i}" for i in range(6)]
+    await handle_download_batch({"paper_ids": paper_ids, "max_concurrency": 2})
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_background_conversions_are_bounded(mocker):
+    """Test that a batch's background conversions share a bounded executor."""
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def mock_convert(paper_id, pdf_path, max_pages=None):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+
+    mocker.patch("arxiv_mcp_server.tools.download._fetch_pdf", return_value=True)
+    mocker.patch(
+        "arxiv_mcp_server.tools.download.convert_pdf_to_markdown",
+        side_effect=mock_convert,
+    )
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        mocker.patch.object(download, "_conversion_executor", executor)
+        paper_ids = [f"2103.1234{i}" for i in range(4)]
+        await handle_download_batch({"paper_ids": paper_ids})
+        await _wait_for_conversions()
+    assert peak == 1
+
+
+@pytest.mark.asyncio
+async def test_lookup_paper_spaces_api_calls(mocker, mock_paper):
+    """Test that concurrent arXiv API lookups are spaced ARXIV_API_DELAY apart."""
+    delay = 0.05
+    mocker.patch("arxiv_mcp_server.tools.download.ARXIV_API_DELAY", delay)
+    mocker.patch("arxiv_mcp_server.tools.download._api_lock", asyncio.Lock())
+    loop = asyncio.get_running_loop()
+    call_times = []
+
+    def mock_search(paper_id):
+        call_times.append(loop.time())
+        return mock_paper
+
+    mocker.patch(
+        "arxiv_mcp_server.tools.download._search_paper", side_effect=mock_search
+    )
+
+    await asyncio.gather(*(download._lookup_paper(f"2103.1234{i}") for i in range(3)))
+    gaps = [later - earlier for earlier, later in zip(call_times, call_times[1:])]
+    assert len(gaps) == 2
+    assert all(gap >= delay * 0.9 for gap in gaps)
+
+
+def test_convert_reuses_cached_markdown(mocker, temp_storage_path):
+    """Test that an identical PDF is not converted twice."""
+    to_markdown = mocker.patch(
+        "pymupdf4llm.to_markdown", return_value="# Cached Paper\nContent"
+    )
+    first_pdf = _make_pdf(get_paper_path("2103.12345", ".pdf"), pages=1)
+    pdf_bytes = first_pdf.read_bytes()
+    convert_pdf_to_markdown("2103.12345", first_pdf)
+
+    second_pdf = get_paper_path("2103.67890", ".pdf")
+    second_pdf.write_bytes(pdf_bytes)
+    convert_pdf_to_markdown("2103.67890", second_pdf)
+
+    assert to_markdown.call_count == 1
+    assert (
+        get_paper_path("2103.67890", ".md").read_text(encoding="utf-8")
+        == "# Cached Paper\nContent"
+    )
+    # Cache hits share the converted file rather than storing another copy
+    assert get_paper_path("2103.12345", ".md").samefile(
+        get_paper_path("2103.67890", ".md")
+    )
+
+
+def test_convert_streams_pages_and_tracks_progress(temp_storage_path):
+    """Test that conversion writes every page and reports page progress."""
+    paper_id = "2103.12345"
+    pdf_path = _make_pdf(get_paper_path(paper_id, ".pdf"), pages=3)
+    status = ConversionStatus(
+        paper_id=paper_id,
+        status="converting",
+        started_at_iso=datetime.now().isoformat(),
+    )
+    conversion_statuses.set(status)
+    convert_pdf_to_markdown(paper_id, pdf_path)
+
+    assert status.status == "success"
+    assert status.pages_done == status.total_pages == 3
+    markdown = get_paper_path(paper_id, ".md").read_text(encoding="utf-8")
+    assert [line for line in markdown.split() if line.isdigit()] == ["1", "2", "3"]
+
+
+def test_convert_scans_headers_once(mocker, temp_storage_path):
+    """Test that header detection runs once per document, not once per page."""
+    mocker.patch.object(settings, "CONVERSION_WORKERS", 1)
+    mocker.patch.object(settings, "KEEP_PDF", True)
+    # to_markdown falls back to the helper module's own reference when not
+    # given hdr_info, so count calls through both names
+    identify = mocker.Mock(wraps=pymupdf4llm.IdentifyHeaders)
+    mocker.patch.object(pymupdf4llm, "IdentifyHeaders", identify)
+    mocker.patch("pymupdf4llm.helpers.pymupdf_rag.IdentifyHeaders", identify)
+    pdf_path = _make_pdf(get_paper_path("2103.12345", ".pdf"), pages=4)
+
+    md_path = convert_pdf_to_markdown("2103.12345", pdf_path)
+    assert "Page 4" in md_path.read_text(encoding="utf-8")
+    assert identify.call_count == 1
+
+    # Worker chunks scan once per chunk as well
+    markdown = download._convert_page_range(str(pdf_path), range(1, 4), {})
+    assert "Page 2" in markdown and "Page 4" in markdown
+    assert identify.call_count == 2
+
+
+def test_convert_failure_removes_partial_markdown(mocker, temp_storage_path):
+    """Test that a conversion failing mid-stream leaves no temp file behind."""
+    mocker.patch.object(settings, "CONVERSION_WORKERS", 1)
+    mocker.patch(
+        "pymupdf4llm.to_markdown", side_effect=["Page 1", RuntimeError("bad page")]
+    )
+    paper_id = "2103.12345"
+    pdf_path = _make_pdf(get_paper_path(paper_id, ".pdf"), pages=2)
+
+    assert convert_pdf_to_markdown(paper_id, pdf_path) is None
+    assert not get_paper_path(paper_id, ".md.tmp").exists()
+    assert not get_paper_path(paper_id, ".md").exists()
+    assert pdf_path.exists()
+
+
+def test_status_store_evicts_expired_and_excess_entries():
+    """Test that the status store stays bounded by TTL and size."""
+    store = StatusStore(maxlen=2, ttl=timedelta(minutes=5))
+    store.set(
+        ConversionStatus(
+            paper_id="old",
+            status="success",
+            started_at_iso=(datetime.now() - timedelta(hours=1)).isoformat(),
+            completed_at_iso=(datetime.now() - timedelta(hours=1)).isoformat(),
+        )
+    )
+    store.set(ConversionStatus("a", "converting", datetime.now().isoformat()))
+    assert "old" not in store
+
+    store.set(ConversionStatus("b", "converting", datetime.now().isoformat()))
+    store.set(ConversionStatus("c", "converting", datetime.now().isoformat()))
+    # In-flight conversions are never evicted, even past the size cap
+    assert "a" in store and "b" in store and "c" in store
+
+    store.update("a", status="success", completed_at_iso=datetime.now().isoformat())
+    store.set(ConversionStatus("d", "converting", datetime.now().isoformat()))
+    assert "a" not in store
+    assert "b" in store and "c" in store and "d" in store
+
+    store.update("c", status="success", pages_done=3)
+    snapshot = store.get("c")
+    assert (snapshot.status, snapshot.pages_done) == ("success", 3)
+    store.update("c", status="error")
+    assert snapshot.status == "success"
+
+
+def test_convert_skips_images_unless_enabled(mocker, temp_storage_path):
+    """Test that image extraction is disabled by default and can be enabled."""
+    to_markdown = mocker.patch("pymupdf4llm.to_markdown", return_value="text")
+    mocker.patch.object(settings, "KEEP_PDF", True)
+    pdf_path = _make_pdf(get_paper_path("2103.12345", ".pdf"), pages=1)
+
+    convert_pdf_to_markdown("2103.12345", pdf_path)
+    assert to_markdown.call_args.kwargs["ignore_images"] is True
+    # Graphics drive table detection, so they are never skipped
+    assert "ignore_graphics" not in to_markdown.call_args.kwargs
+
+    mocker.patch.object(settings, "EXTRACT_IMAGES", True)
+    # Use a page limit so the first conversion is not served from the cache
+    convert_pdf_to_markdown("2103.12345", pdf_path, max_pages=1)
+    assert "ignore_images" not in to_markdown.call_args.kwargs
+
+
+def test_convert_parallel_matches_serial(mocker, temp_storage_path):
+    """Test that page-parallel conversion yields the same markdown as serial."""
+    pdf_path = _make_pdf(get_paper_path("2103.12345", ".pdf"), pages=6)
+
+    mocker.patch.object(settings, "CONVERSION_WORKERS", 1)
+    serial = convert_pdf_to_markdown("2103.12345", pdf_path, max_pages=5)
+
+    mocker.patch.object(settings, "CONVERSION_WORKERS", 2)
+    parallel = convert_pdf_to_markdown("2103.12345", pdf_path)
+
+    full = parallel.read_text(encoding="utf-8")
+    assert full.startswith(serial.read_text(encoding="utf-8"))
+    assert "Page 6" in full
+
+
+def test_convert_recovers_from_broken_pool(mocker, temp_storage_path):
+    """Test that a broken pool is dropped and the rest converted serially."""
+    pdf_path = _make_pdf(get_paper_path("2103.12345", ".pdf"), pages=16)
+
+    def broken_map(fn, *iterables):
+        yield fn(*next(zip(*iterables)))
+        raise BrokenProcessPool("worker died")
+
+    pool = mocker.Mock(map=broken_map)
+    mocker.patch.object(download, "_conversion_pool", pool)
+    mocker.patch.object(settings, "CONVERSION_WORKERS", 2)
+    md_path = convert_pdf_to_markdown("2103.12345", pdf_path)
+
+    markdown = md_path.read_text(encoding="utf-8")
+    assert all(f"Page {i}" in markdown for i in range(1, 17))
+    assert markdown.index("Page 2") < markdown.index("Page 3")
+    assert markdown.count("Page 3") == 1
+    pool.shutdown.assert_called_once()
+    assert download._conversion_pool is None
+
+
+def test_convert_removes_pdf_unless_kept(mocker, temp_storage_path):
+    """Test that the PDF is deleted after conversion unless KEEP_PDF is set."""
+    pdf_path = _make_pdf(get_paper_path("2103.12345", ".pdf"), pages=2)
+    convert_pdf_to_markdown("2103.12345", pdf_path, max_pages=1)
+    assert pdf_path.exists()
+
+    mocker.patch.object(settings, "KEEP_PDF", True)
+    convert_pdf_to_markdown("2103.12345", pdf_path)
+    assert pdf_path.exists()
+
+    mocker.patch.object(settings, "KEEP_PDF", False)
+    get_paper_path("2103.12345", ".md").unlink()
+    convert_pdf_to_markdown("2103.12345", pdf_path)
+    assert not pdf_path.exists()
+    assert get_paper_path("2103.12345", ".md").exists()
+
+    # Partial conversions of a converted paper don't orphan a fresh PDF, but
+    # leave it alone while another conversion of the paper still reads it
+    _make_pdf(pdf_path, pages=2)
+    conversion_statuses.set(
+        ConversionStatus("2103.12345:p2", "converting", datetime.now().isoformat())
+    )
+    convert_pdf_to_markdown("2103.12345", pdf_path, max_pages=1)
+    assert pdf_path.exists()
+    conversion_statuses.clear()
+    convert_pdf_to_markdown("2103.12345", pdf_path, max_pages=1)
+    assert not pdf_path.exists()